@@ -5,14 +5,19 @@ import copy
 import json
 import random 
 
+# Shipment flags, stored per santa in the shipments file.
+SHIPPED = 1
+RECEIVED = 2
+
 class User:
     """Represents an user. 
     """
-    def __init__(self, username, address="", message="", status=""):
+    def __init__(self, username, address="", message="", status="", chat_id=None):
         self.username = username
         self.address = address
         self.message = message
         self.status = ""
+        self.chat_id = chat_id
 
     def reset_status(self):
         self.status = ""
@@ -22,23 +27,30 @@ class RegisteredDatabase:
     Stores the data regarding the registered users, i.e. their username and address.
     """
 
-    def __init__(self, path_to_db, path_to_settings, path_to_santas="assignments.json"):
+    def __init__(self, path_to_db, path_to_settings, path_to_santas="assignments.json", path_to_shipments="shipments.json"):
         """Initialize the database with the data stored at path_to_db.
 
         Args:
             path_to_db (string): path to a .csv file containing the usernames of registered, their address and the message that they want to leave to the Secret Santa.
             path_to_settings (string): path to a .csv file containing the settings of the database (readonly or write).
+            path_to_shipments (string): path to a .json file containing the shipment flags of each santa.
         Side-effects:
             self._users (dict(string, string)): contains the username of reigstered users and their address.
         """
         self._path_to_settings = path_to_settings
         self._path_to_db = path_to_db
         self._path_to_santas = path_to_santas
+        self._path_to_shipments = path_to_shipments
         self._users={}
         self._santas = {}
+        self._children = {}
+        self._shipments = {}
+        self._not_shipped = set()
+        self._not_received = set()
         self._can_add_modify_user=False
         self._users_from_dir()
         self._santas_from_file()
+        self._shipments_from_file()
         self._settings_from_csv()
 
     def _settings_from_csv(self):
@@ -72,7 +84,7 @@ class RegisteredDatabase:
                 path = self._path_to_db+ "/"+fp
                 with open(path, "r") as f_user:
                     user_dict = json.load(f_user)
-                    user = User(user_dict["username"], user_dict["address"], user_dict["message"], user_dict["status"])
+                    user = User(user_dict["username"], user_dict["address"], user_dict["message"], user_dict["status"], user_dict.get("chat_id"))
                     self._users[user_dict["username"]] = user
         
     def _dir_from_users(self):
@@ -134,12 +146,39 @@ class RegisteredDatabase:
 
     def save_santas(self):
         """
-        Dump the santas to file.
+        Dump the santas to file, and clear the shipments of any previous assignment.
         """
         msg = self._file_from_santas()
         self._santas_from_file()
+        self._shipments = {}
+        self._file_from_shipments()
+        self._shipments_from_file()
         return msg
 
+    def _shipments_from_file(self):
+        """Initialize self._shipments from the json file saved at self._path_to_shipments, and build the
+        sets of santas that still have to ship and of children that still have to confirm the receipt.
+        self._children is set last, since has_assignments relies on it to know that the sets are ready.
+
+        Side-effects:
+            self._shipments contains the shipment flags (SHIPPED|RECEIVED) of each santa.
+            self._children contains the match between a child and their santa.
+            self._not_shipped and self._not_received are rebuilt from scratch.
+        """
+        self._shipments = {}
+        if os.path.exists(self._path_to_shipments):
+            with open(self._path_to_shipments, "r") as fp:
+                self._shipments = json.load(fp)
+        self._not_shipped = {santa for santa in self._santas if not self._shipments.get(santa, 0) & SHIPPED}
+        self._not_received = {child for santa, child in self._santas.items() if not self._shipments.get(santa, 0) & RECEIVED}
+        self._children = {child: santa for santa, child in self._santas.items()}
+
+    def _file_from_shipments(self):
+        """Dump self._shipments to a .json file at self._path_to_shipments.
+        """
+        with open(self._path_to_shipments, "w") as fp:
+            json.dump(self._shipments, fp)
+
     def get_child(self, username):
         """Get the child that was assigned to this santa. 
 
@@ -168,6 +207,142 @@ class RegisteredDatabase:
             msg+="\nE' una persona davvero speciale, buona fortuna!\n"
         return msg
 
+    def mark_shipped(self, username):
+        """Record that the santa username has shipped the gift to their child.
+
+        Args:
+            username (string): the santa's Telegram username.
+        Returns:
+            string: a message stating whether the shipment was recorded.
+        """
+        if not self._santas:
+            return "Sembra che le assegnazioni non siano ancora avvenute!\n"
+        if username not in self._santas.keys():
+            return "Sembra che non ti sia stato assegnato nessuno, quindi non hai regali da spedire.\n"
+        if self._shipments.get(username, 0) & RECEIVED:
+            return "@" + self._santas[username] + " ha già confermato di aver ricevuto il regalo!\n"
+        if username not in self._not_shipped:
+            return "Avevi già segnalato di aver spedito il regalo a @" + self._santas[username] + "!\n"
+        self._shipments[username] = self._shipments.get(username, 0) | SHIPPED
+        self._not_shipped.discard(username)
+        self._file_from_shipments()
+        return "Grazie! Ho segnato che hai spedito il regalo a @" + self._santas[username] + " 📦\n"
+
+    def mark_received(self, username):
+        """Record that the child username has received the gift from their santa.
+
+        Receiving a gift implies that it was shipped, so the santa is marked as shipped as well.
+
+        Args:
+            username (string): the child's Telegram username.
+        Returns:
+            string: a message stating whether the receipt was recorded.
+        """
+        if not self._santas:
+            return "Sembra che le assegnazioni non siano ancora avvenute!\n"
+        if username not in self._children.keys():
+            return "Sembra che nessuno ti sia stato assegnato come Secret Santa.\n"
+        if username not in self._not_received:
+            return "Avevi già segnalato di aver ricevuto il tuo regalo!\n"
+        santa = self._children[username]
+        self._shipments[santa] = self._shipments.get(santa, 0) | SHIPPED | RECEIVED
+        self._not_received.discard(username)
+        self._not_shipped.discard(santa)
+        self._file_from_shipments()
+        return "Che bello! Ho segnato che hai ricevuto il tuo regalo 🎁 Buon Natale!\n"
+
+    def has_assignments(self):
+        """Check if the santas have already been assigned and the shipment sets built.
+
+        Returns:
+            bool: True if the assignments have been made, False otherwise.
+        """
+        return bool(self._children)
+
+    def get_not_shipped_msg(self):
+        """Return the usernames of the santas that haven't shipped their gift yet.
+
+        Returns:
+            string: a message with the username of the santas that still need to ship.
+        """
+        if not self._santas:
+            return "Le assegnazioni non sono ancora avvenute.\n"
+        msg = str(len(self._santas) - len(self._not_shipped)) + "/" + str(len(self._santas)) + " Secret Santa hanno spedito il regalo.\n"
+        if self._not_shipped:
+            msg += ",".join("@" + username for username in sorted(self._not_shipped))
+            msg += "\n non hanno ancora spedito il regalo.\n"
+        msg += self._get_unreachable_msg(self._not_shipped)
+        return msg
+
+    def get_not_received_msg(self):
+        """Return the usernames of the users that haven't received their gift yet.
+
+        Returns:
+            string: a message with the username of the users that still have to confirm the receipt.
+        """
+        if not self._santas:
+            return "Le assegnazioni non sono ancora avvenute.\n"
+        msg = str(len(self._children) - len(self._not_received)) + "/" + str(len(self._children)) + " utenti hanno ricevuto il regalo.\n"
+        if self._not_received:
+            msg += ",".join("@" + username for username in sorted(self._not_received))
+            msg += "\n non hanno ancora ricevuto il regalo.\n"
+        msg += self._get_unreachable_msg(self._not_received)
+        return msg
+
+    def _get_unreachable_msg(self, usernames):
+        """Return the usernames, among usernames, of the users the bot can't write to.
+
+        Args:
+            usernames (set(string)): the usernames of the users to check.
+        Returns:
+            string: a message with the users that won't receive the reminders, empty if there are none.
+        """
+        unreachable = [username for username in sorted(usernames) if self.get_chat_id(username) is None]
+        if not unreachable:
+            return ""
+        msg = ",".join("@" + username for username in unreachable)
+        msg += "\n non mi hanno mai scritto, quindi non riceveranno i promemoria.\n"
+        return msg
+
+    def get_users_to_remind(self, kind):
+        """Return the users that should be nudged for a reminder of the given kind.
+
+        Args:
+            kind (string): "shipped" for santas that haven't shipped, "received" for users that haven't received.
+        Returns:
+            set(string): the usernames of the users to remind.
+        """
+        if kind == "shipped":
+            return set(self._not_shipped)
+        if kind == "received":
+            return set(self._not_received)
+        return set()
+
+    def update_chat_id(self, username, chat_id):
+        """Remember the chat of an user, so that the bot can write to them first.
+
+        Args:
+            username (string): the user's Telegram username.
+            chat_id (int): the id of the private chat with the user.
+        """
+        if not username in self._users.keys() or self._users[username].chat_id == chat_id:
+            return
+        self._users[username].chat_id = chat_id
+        self._update_user_db(username)
+
+    def get_chat_id(self, username):
+        """Get the chat of an user.
+
+        Args:
+            username (string): the user's Telegram username.
+
+        Returns:
+            int: the id of the chat with the user, None if unknown.
+        """
+        if not username in self._users.keys():
+            return None
+        return self._users[username].chat_id
+
     def get_incomplete_users(self):
         """Return the usernames of the user that haven't registered an address yet.
 
@@ -2,5 +2,9 @@ touch api_token.csv
 touch assignments.json
 mkdir users
 touch settings.csv
+touch shipments.json
+touch reminders.json
 echo {} > assignments.json
 echo True > settings.csv
+echo {} > shipments.json
+echo [] > reminders.json
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+DEADLINE_FORMAT = "%Y-%m-%d %H:%M"
+REMINDER_KINDS = ("shipped", "received")
+
+logger = logging.getLogger(__name__)
+
+class TimerWheel:
+    """A hashed timer wheel: each pending item lives in the slot of the tick it expires at,
+    so advancing the clock only looks at the slots that were actually crossed.
+    """
+    def __init__(self, tick_seconds=60, n_slots=60, now=None):
+        """Initialize an empty wheel.
+
+        Args:
+            tick_seconds (int): the granularity of the wheel, in seconds.
+            n_slots (int): the number of slots of the wheel.
+            now (float): the current time, defaults to time.time().
+        """
+        self._tick_seconds = tick_seconds
+        self._slots = [[] for _ in range(n_slots)]
+        self._current = self._tick_of(time.time() if now is None else now)
+
+    def _tick_of(self, when):
+        return int(when // self._tick_seconds)
+
+    def add(self, when, item):
+        """Schedule item to expire at time when. Items in the past expire at the next advance.
+
+        Args:
+            when (float): the expiration time, as a unix timestamp.
+            item (object): the item to be returned once expired.
+        """
+        tick = max(self._tick_of(when), self._current)
+        self._slots[tick % len(self._slots)].append((tick, item))
+
+    def advance(self, now=None):
+        """Move the wheel up to time now.
+
+        Args:
+            now (float): the current time, defaults to time.time().
+        Returns:
+            list(object): the items that expired, in expiration order.
+        """
+        target = self._tick_of(time.time() if now is None else now)
+        # Visiting every slot once is enough to collect everything, however far behind we are.
+        last = min(target, self._current + len(self._slots) - 1)
+        expired = []
+        for tick in range(self._current, last + 1):
+            slot = self._slots[tick % len(self._slots)]
+            due = [entry for entry in slot if entry[0] <= target]
+            if due:
+                slot[:] = [entry for entry in slot if entry[0] > target]
+                expired.extend(due)
+        self._current = target
+        expired.sort(key=lambda entry: entry[0])
+        return [item for _, item in expired]
+
+class ReminderScheduler:
+    """
+    Fires the reminders configured in a .json file at their deadline, remembering which ones were already sent.
+    """
+
+    def __init__(self, path_to_reminders, send_reminders, can_send=lambda: True, tick_seconds=60):
+        """Load the reminders stored at path_to_reminders and schedule the pending ones.
+
+        Args:
+            path_to_reminders (string): path to a .json file containing a list of reminders,
+                each one being {"deadline": "YYYY-MM-DD HH:MM", "kind": "shipped"|"received", "sent": bool}.
+            send_reminders (function): called with the list of kinds due in the same tick, so that
+                the nudges can be sent in a single batch.
+            can_send (function): returns whether the reminders can be sent yet (e.g. the santas were assigned);
+                until then the due reminders are kept pending.
+            tick_seconds (int): how often the scheduler wakes up, in seconds.
+        """
+        self._path_to_reminders = path_to_reminders
+        self._send_reminders = send_reminders
+        self._can_send = can_send
+        self._tick_seconds = tick_seconds
+        self._wheel = TimerWheel(tick_seconds)
+        self._reminders = []
+        self._reminders_from_file()
+
+    def _reminders_from_file(self):
+        """Load the reminders from self._path_to_reminders and add the ones not yet sent to the wheel.
+
+        Invalid reminders are logged and ignored, so that a typo doesn't prevent the bot from starting.
+
+        Side-effects:
+            self._reminders contains every configured reminder.
+        """
+        if not os.path.exists(self._path_to_reminders):
+            return
+        with open(self._path_to_reminders, "r") as fp:
+            self._reminders = json.load(fp)
+        for reminder in self._reminders:
+            if not isinstance(reminder, dict):
+                logger.error("Ignoring reminder %s: it must be an object", reminder)
+                continue
+            if reminder.get("sent", False):
+                continue
+            if reminder.get("kind") not in REMINDER_KINDS:
+                logger.error("Ignoring reminder %s: kind must be one of %s", reminder, REMINDER_KINDS)
+                continue
+            try:
+                deadline = datetime.strptime(reminder.get("deadline", ""), DEADLINE_FORMAT)
+            except (TypeError, ValueError):
+                logger.error("Ignoring reminder %s: deadline must be formatted as %s", reminder, DEADLINE_FORMAT)
+                continue
+            self._wheel.add(time.mktime(deadline.timetuple()), reminder)
+
+    def _file_from_reminders(self):
+        """Dump self._reminders to self._path_to_reminders.
+        """
+        with open(self._path_to_reminders, "w") as fp:
+            json.dump(self._reminders, fp, indent=1)
+
+    def tick(self):
+        """Fire the reminders whose deadline has passed and mark them as sent.
+
+        If the reminders can't be sent yet, or sending them fails, the due ones are put back on the wheel
+        for the next tick.
+        """
+        due = self._wheel.advance()
+        if not due:
+            return
+        try:
+            if not self._can_send():
+                self._postpone(due)
+                return
+            self._send_reminders([reminder["kind"] for reminder in due])
+        except Exception:
+            self._postpone(due)
+            raise
+        for reminder in due:
+            reminder["sent"] = True
+        self._file_from_reminders()
+
+    def _postpone(self, reminders):
+        for reminder in reminders:
+            self._wheel.add(time.time(), reminder)
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Error while sending the reminders")
+            time.sleep(self._tick_seconds)
+
+    def start(self):
+        """Run the scheduler in a background thread.
+        """
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
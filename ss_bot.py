@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 #!/usr/bin/python
 import csv 
+import logging
 
 # This is a simple Secret Santa bot tailored for the Breaking Italy Club.
 # It allows to register/delete oneself from the users that take part in the Secret Santa,
@@ -9,6 +10,7 @@ import csv
 
 import telebot
 from database import RegisteredDatabase
+from scheduler import ReminderScheduler
 
 def read_token(path):
 	with open(path) as csv_file:
@@ -20,6 +22,8 @@ def read_token(path):
 
 API_TOKEN = read_token("api_token.csv")
 
+logger = logging.getLogger(__name__)
+
 bot = telebot.TeleBot(API_TOKEN)
 db = RegisteredDatabase("users", "settings.csv")
 
@@ -28,9 +32,37 @@ db = RegisteredDatabase("users", "settings.csv")
 admins =["Luca_MS", "merlo24"]
 status =["address", "message"]
 
+reminder_msgs = {
+	"shipped": "Ricordati di spedire il regalo alla persona che ti è stata assegnata! 📦 Quando l'hai spedito usa il comando /shipped",
+	"received": "Hai ricevuto il tuo regalo? 🎁 Fammelo sapere con il comando /received",
+}
+
+def send_reminders(kinds):
+	"""Send the nudges of all the reminders due together, at most one message per user.
+	"""
+	nudges = {}
+	for kind in kinds:
+		for username in db.get_users_to_remind(kind):
+			nudges.setdefault(username, [])
+			if reminder_msgs[kind] not in nudges[username]:
+				nudges[username].append(reminder_msgs[kind])
+	for username, msgs in nudges.items():
+		chat_id = db.get_chat_id(username)
+		if chat_id is None:
+			logger.warning("Could not send the reminder to @%s: they never wrote to the bot", username)
+			continue
+		try:
+			bot.send_message(chat_id, "\n".join(msgs))
+		except telebot.apihelper.ApiTelegramException as e:
+			# The user may have blocked the bot, don't stop the other nudges.
+			# Other errors (e.g. no connection) propagate, so that the reminders are retried.
+			logger.warning("Could not send the reminder to @%s: %s", username, e)
+
+scheduler = ReminderScheduler("reminders.json", send_reminders, db.has_assignments)
+
 @bot.message_handler(commands=['help', 'start'])
 def send_welcome(message):
-
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	msg = """\
 Ciao! Sono il bot NON ufficiale per il Secret Santa 🎅 del Breaking Italy Club. 
 In questa fase mi puoi controllare solo con questo comando: \n
@@ -45,8 +77,10 @@ Quando sarai registrato potrai usare i comandi:
 /add_message - 📬 lascia un messaggio al tuo Secret Santa. Usalo per dare dei suggerimenti, una blacklist, o delle informazioni aggiuntive! 
 /modify_message - 📬 modifica il messaggio lasciato al tuo Secret Santa.
 
-A partire dal 2 Dicembre, sarà invece disponibile solo il comando:
+A partire dal 2 Dicembre, saranno invece disponibili solo i comandi:
 /assign_me - ti verrà assegnata la persona a cui dovrai fare il regalo, e ti verrà mostrato il suo handler di Telegram, indirizzo e eventualmente il messaggio che ti ha scritto.
+/shipped - 📦 segnala di aver spedito il regalo.
+/received - 🎁 segnala di aver ricevuto il tuo regalo.
 
 L'indicazione è di spendere circa 10 euro per il regalo, spese di spedizione escluse. \n
 Usami con cautela! Ché il programmatore è un po' un cane 🐶 quindi è possibile che io sia buggato 🧠.\n\
@@ -57,6 +91,8 @@ Usami con cautela! Ché il programmatore è un po' un cane 🐶 quindi è possib
 		msg+="/toggle_registrations - Per fermare o far ripartire i comandi che permettono di registrarsi/modificare i propri dati\n"
 		msg+="/assign - Per procedere alle assegnazioni casuali.\n"
 		msg+="/incomplete_users - Per sapere chi non ha ancora inserito un indirizzo \n"
+		msg+="/not_shipped - Per sapere chi non ha ancora spedito il regalo \n"
+		msg+="/not_received - Per sapere chi non ha ancora ricevuto il regalo \n"
 
 	bot.reply_to(message, msg)
 
@@ -71,13 +107,16 @@ def handle_register(message):
 	If the user is not registered, ask to confirm their choice.
 	"""
 	db.reset_user_status(message.from_user.username)
-	bot.reply_to(message, db.add_user(message.from_user.username))
+	reply = db.add_user(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
+	bot.reply_to(message, reply)
 
 @bot.message_handler(commands=['delete_me'])
 def handle_delete(message):
 	"""Delete an user from the registered users.
 	"""
 	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	bot.reply_to(message, db.remove_user(message.from_user.username))
 
 @bot.message_handler(commands=['my_info'])
@@ -85,6 +124,7 @@ def handle_myinfo(message):
 	"""Print an user info.
 	"""
 	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	reply = ""
 	if message.from_user.username in admins:
 		reply+="Sei un admin!\n"
@@ -96,12 +136,14 @@ def handle_myinfo(message):
 def handle_address(message):
 	"""Add an address to a registered user.
 	"""
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	bot.reply_to(message, db.set_user_status(message.from_user.username, "address"))
 
 @bot.message_handler(commands=['add_message', 'modify_message'])
 def handle_message_to_ss(message):
 	"""Add an address to a registered user.
 	"""
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	bot.reply_to(message, db.set_user_status(message.from_user.username, "message"))
 
 @bot.message_handler(commands=['assign_me'])
@@ -109,13 +151,31 @@ def handle_assign_me(message):
 	"""Add an address to a registered user.
 	"""
 	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	bot.reply_to(message, db.get_child(message.from_user.username))
 
+@bot.message_handler(commands=['shipped'])
+def handle_shipped(message):
+	"""Record that the user has shipped the gift to their child.
+	"""
+	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
+	bot.reply_to(message, db.mark_shipped(message.from_user.username))
+
+@bot.message_handler(commands=['received'])
+def handle_received(message):
+	"""Record that the user has received the gift from their santa.
+	"""
+	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
+	bot.reply_to(message, db.mark_received(message.from_user.username))
+
 @bot.message_handler(commands=['assign'])
 def handle_assign(message):
 	"""Add an address to a registered user.
 	"""
 	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	if message.from_user.username not in admins:
 		return
 	msg = db.get_incomplete_users()
@@ -126,16 +186,34 @@ def handle_assign(message):
 @bot.message_handler(commands=['incomplete_users'])
 def handle_incomplete(message):
 	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	if message.from_user.username not in admins:
 		return
 	bot.reply_to(message, db.get_incomplete_users())
 
+@bot.message_handler(commands=['not_shipped'])
+def handle_not_shipped(message):
+	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
+	if message.from_user.username not in admins:
+		return
+	bot.reply_to(message, db.get_not_shipped_msg())
+
+@bot.message_handler(commands=['not_received'])
+def handle_not_received(message):
+	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
+	if message.from_user.username not in admins:
+		return
+	bot.reply_to(message, db.get_not_received_msg())
+
 ##### Admin commands
 @bot.message_handler(commands=['toggle_registrations'])
 def handle_toggle_registrations(message):
 	"""Toggles the registration functionalities.
 	"""
 	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	if message.from_user.username not in admins:
 		return 
 	bot.reply_to(message, db.toggle_registrations())
@@ -143,6 +221,7 @@ def handle_toggle_registrations(message):
 @bot.message_handler(commands=['user_list'])
 def handle_user_list(message):
 	db.reset_user_status(message.from_user.username)
+	db.update_chat_id(message.from_user.username, message.from_user.id)
 	bot.reply_to(message, db.get_user_list_msg())
 
 # Handle all other messages with content_type 'text' (content_types defaults to ['text'])
@@ -151,6 +230,7 @@ def echo_message(message):
 	text = message.text.lower()
 	reply = ""
 	username = message.from_user.username
+	db.update_chat_id(username, message.from_user.id)
 	status = db.get_user_status(username)
 
 	if status == "address":
@@ -169,4 +249,5 @@ def echo_message(message):
 		reply = "Super interessante! Purtroppo non so cosa rispondere ma ti auguro un felice Natale!"
 	bot.reply_to(message, reply)
 
+scheduler.start()
 bot.polling()